@@ -3,11 +3,17 @@
 
 """ Test convert.py """
 
+import io
+import json
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
 import unittest
+from unittest import mock
 
-from tf2onnx import convert
+from tf2onnx import convert, utils
 from common import check_tf_min_version
 
 def run_test_case(args, paths_to_check=None):
@@ -76,6 +82,68 @@ class Tf2OnnxConvertTest(unittest.TestCase):
                                        '--output',
                                        'converted_graphdef.onnx']))
 
+    def test_convert_graphdef_tf_threads(self):
+        """ convert graphdef with a limited tensorflow thread pool """
+        # tensorflow is initialized once per process, so check the thread pools in a fresh one
+        script = "\n".join([
+            "import sys",
+            "import tensorflow as tf",
+            "from tf2onnx import convert",
+            "sys.argv = sys.argv[1:]",
+            "convert.main()",
+            "print(tf.config.threading.get_intra_op_parallelism_threads(),",
+            "      tf.config.threading.get_inter_op_parallelism_threads())",
+        ])
+        output = subprocess.check_output([sys.executable, "-c", script, '',
+                                          '--input',
+                                          'tests/models/regression/graphdef/frozen.pb',
+                                          '--inputs',
+                                          'X:0',
+                                          '--outputs',
+                                          'pred:0',
+                                          '--tf-threads',
+                                          '2',
+                                          '--output',
+                                          'converted_graphdef_tf_threads.onnx'])
+        self.assertEqual(output.split()[-2:], [b'2', b'1'])
+        self.assertTrue(os.path.exists('converted_graphdef_tf_threads.onnx'))
+        os.remove('converted_graphdef_tf_threads.onnx')
+
+    def test_convert_graphdef_grappler_full(self):
+        """ convert graphdef with all grappler optimizers """
+        self.assertTrue(run_test_case(['',
+                                       '--input',
+                                       'tests/models/regression/graphdef/frozen.pb',
+                                       '--inputs',
+                                       'X:0',
+                                       '--outputs',
+                                       'pred:0',
+                                       '--grappler-full',
+                                       '--output',
+                                       'converted_graphdef_grappler_full.onnx']))
+
+    def test_convert_graphdef_custom_ops(self):
+        """ convert graphdef, mapping Mul to a custom op domain """
+        sys.argv = ['',
+                    '--input',
+                    'tests/models/regression/graphdef/frozen.pb',
+                    '--inputs',
+                    'X:0',
+                    '--outputs',
+                    'pred:0',
+                    '--custom-ops',
+                    'Mul:test.domain',
+                    '--extra_opset',
+                    'test.domain:1',
+                    '--output',
+                    'converted_graphdef_custom_ops.onnx']
+        convert.main()
+        model_proto = utils.model_proto_from_file('converted_graphdef_custom_ops.onnx')
+        os.remove('converted_graphdef_custom_ops.onnx')
+        mul_nodes = [node for node in model_proto.graph.node if node.op_type == 'Mul']
+        self.assertTrue(mul_nodes)
+        self.assertTrue(all(node.domain == 'test.domain' for node in mul_nodes))
+
     def test_convert_checkpoint(self):
         """ convert checkpoint """
         self.assertTrue(run_test_case(['',
@@ -125,5 +193,90 @@ class Tf2OnnxConvertTest(unittest.TestCase):
                                        '--output',
                                        'converted_checkpoint.onnx']))
 
+    def test_convert_use_cache(self):
+        """ a repeated conversion is served from the cache """
+        with tempfile.TemporaryDirectory() as cache_home, mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home}):
+            args = ['', '--input', 'tests/models/regression/graphdef/frozen.pb', '--inputs', 'X:0',
+                    '--outputs', 'pred:0', '--use-cache', '--output', 'converted_graphdef_cached.onnx']
+            self.assertTrue(run_test_case(args))
+            cache_dir = os.path.join(cache_home, 'tf2onnx')
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertTrue(run_test_case(args))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # a change of the conversion args is a different cache entry
+            self.assertTrue(run_test_case(args[:-2] + ['--opset', '13'] + args[-2:]))
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_convert_use_cache_output_next_to_model(self):
+        """ the output written next to the model is not part of the cache key """
+        with tempfile.TemporaryDirectory() as cache_home, mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home}), \
+                tempfile.TemporaryDirectory() as model_dir:
+            model_path = os.path.join(model_dir, 'frozen.pb')
+            shutil.copyfile('tests/models/regression/graphdef/frozen.pb', model_path)
+            sys.argv = ['', '--input', model_path, '--inputs', 'X:0', '--outputs', 'pred:0', '--use-cache',
+                        '--output', os.path.join(model_dir, 'model.onnx')]
+            convert.main()
+            for _ in range(2):
+                with self.assertLogs('tf2onnx', level='INFO') as logs:
+                    convert.main()
+                self.assertTrue(any('Reusing the cached conversion' in line for line in logs.output))
+            self.assertEqual(len(os.listdir(os.path.join(cache_home, 'tf2onnx'))), 1)
+
+    def test_convert_use_cache_remote_model(self):
+        """ models that are not local files are not cached """
+        with tempfile.TemporaryDirectory() as cache_home, mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home}):
+            model_url = 'file://' + os.path.abspath('tests/models/regression/graphdef/frozen.pb')
+            self.assertTrue(run_test_case(['', '--input', model_url, '--inputs', 'X:0', '--outputs', 'pred:0',
+                                           '--use-cache', '--output', 'converted_graphdef_remote.onnx']))
+            self.assertFalse(os.path.exists(os.path.join(cache_home, 'tf2onnx')))
+
+    def test_convert_server(self):
+        """ convert graphdef requests read from stdin """
+        requests = [{'input': 'tests/models/regression/graphdef/frozen.pb', 'inputs': 'X:0', 'outputs': 'pred:0',
+                     'output': 'converted_server.onnx'},
+                    {'input': 'tests/models/regression/graphdef/frozen.pb', 'output': 'converted_server_bad.onnx'},
+                    {'input': 'tests/models/regression/graphdef/frozen.pb', 'inputs': ['X:0'], 'outputs': ['pred:0'],
+                     'output': 'converted_server_list.onnx'},
+                    {'input': 'tests/models/regression/graphdef/frozen.pb', 'inputs': 'X:0', 'outputs': 'pred:0',
+                     'tf-threads': 2, 'output': 'converted_server_threads.onnx'}]
+        stdout = io.StringIO()
+        convert.serve(io.StringIO("\n".join(json.dumps(r) for r in requests)), stdout)
+        responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(responses[0], {'status': 'ok', 'output': 'converted_server.onnx'})
+        self.assertEqual(responses[1]['status'], 'error')
+        self.assertEqual(responses[2], {'status': 'ok', 'output': 'converted_server_list.onnx'})
+        self.assertEqual(responses[3]['status'], 'error')
+        self.assertIn('--tf-threads', responses[3]['error'])
+        self.assertTrue(os.path.exists('converted_server.onnx'))
+        self.assertFalse(os.path.exists('converted_server_bad.onnx'))
+        self.assertTrue(os.path.exists('converted_server_list.onnx'))
+        self.assertFalse(os.path.exists('converted_server_threads.onnx'))
+        os.remove('converted_server.onnx')
+        os.remove('converted_server_list.onnx')
+
+    def test_parse_cpulist(self):
+        """ parse linux cpu lists used by --pin-numa """
+        # pylint: disable=protected-access
+        self.assertEqual(convert._parse_cpulist('0-3,8,10-11\n'), {0, 1, 2, 3, 8, 10, 11})
+        self.assertEqual(convert._parse_cpulist(''), set())
+
+    def test_rename_map(self):
+        """ --rename-inputs/--rename-outputs are checked against the model names """
+        # pylint: disable=protected-access
+        self.assertEqual(convert._rename_map(['a:0', 'b:0'], ['x', 'y'], 'inputs'), {'a:0': 'x', 'b:0': 'y'})
+        with self.assertRaisesRegex(ValueError, "has 1 names but the model has 2 inputs"):
+            convert._rename_map(['a:0', 'b:0'], ['x'], 'inputs')
+        with self.assertRaisesRegex(ValueError, "duplicate"):
+            convert._rename_map(['a:0', 'b:0'], ['x', 'x'], 'outputs')
+        with self.assertRaisesRegex(ValueError, "use --outputs"):
+            convert._rename_map(None, ['x'], 'outputs')
+
+    def test_get_args_from_argv(self):
+        """ parse an explicit argv without touching sys.argv """
+        args = convert.get_args(['--input', 'frozen.pb', '--inputs', 'X:0', '--outputs', 'pred:0,Mul:0'])
+        self.assertEqual(args.graphdef, 'frozen.pb')
+        self.assertEqual(args.inputs, ['X:0'])
+        self.assertEqual(args.outputs, ['pred:0', 'Mul:0'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 
 """Unit Tests for internal methods."""
 
+import os
 from collections import namedtuple
 
 import graphviz as gv
@@ -285,6 +286,51 @@ class Tf2OnnxInternalTests(Tf2OnnxBackendTestBase):
 
             self.assertTrue(np.array_equal(expected, actual))
 
+    def test_const_folding_using_numpy(self):
+        x = np.array([[1, 2], [3, 4]], dtype=np.int32)
+        y = np.array([10, 20], dtype=np.int32)
+        res = tf_utils.compute_const_folding_using_numpy("AddV2", [x, y])
+        self.assertTrue(np.array_equal(res[0], x + y))
+        self.assertEqual(res[0].dtype, np.int32)
+        res = tf_utils.compute_const_folding_using_numpy("Reshape", [x, np.array([-1], dtype=np.int64)])
+        self.assertTrue(np.array_equal(res[0], [1, 2, 3, 4]))
+        # mixed dtypes, unsupported dtypes and ops are left to tensorflow
+        self.assertIsNone(tf_utils.compute_const_folding_using_numpy("Mul", [x, y.astype(np.int64)]))
+        self.assertIsNone(tf_utils.compute_const_folding_using_numpy("Add", [x.astype(np.float16)] * 2))
+        self.assertIsNone(tf_utils.compute_const_folding_using_numpy("MatMul", [x, x]))
+
+    def test_save_protobuf_chunked(self):
+        const_1 = helper.make_tensor("const_1", TensorProto.FLOAT, [2], [1., 2.])
+        # more than 127 bytes so the length prefixes need several varint bytes
+        const_2 = helper.make_tensor("const_2", TensorProto.INT64, [1000], list(range(1000)))
+        node = helper.make_node("Add", ["X", "const_1"], ["Y"], name="add")
+        graph_proto = helper.make_graph(
+            nodes=[node],
+            name="test",
+            inputs=[helper.make_tensor_value_info("X", TensorProto.FLOAT, [2])],
+            outputs=[helper.make_tensor_value_info("Y", TensorProto.FLOAT, [2])],
+            initializer=[const_1, const_2]
+        )
+        model_proto = helper.make_model(graph_proto, producer_name="tf2onnx")
+        path = os.path.join(self.test_data_directory, "test_save_protobuf_chunked.onnx")
+        threshold = utils.SAVE_PROTOBUF_CHUNKED_THRESHOLD
+        utils.SAVE_PROTOBUF_CHUNKED_THRESHOLD = 0
+        try:
+            utils.save_protobuf(path, model_proto)
+        finally:
+            utils.SAVE_PROTOBUF_CHUNKED_THRESHOLD = threshold
+        self.assertEqual(utils.model_proto_from_file(path), model_proto)
+
+        max_size = utils.PROTOBUF_MAX_SIZE
+        utils.SAVE_PROTOBUF_CHUNKED_THRESHOLD = 0
+        utils.PROTOBUF_MAX_SIZE = model_proto.ByteSize() - 1
+        try:
+            with self.assertRaisesRegex(ValueError, "Try setting large_model"):
+                utils.save_protobuf(path, model_proto)
+        finally:
+            utils.SAVE_PROTOBUF_CHUNKED_THRESHOLD = threshold
+            utils.PROTOBUF_MAX_SIZE = max_size
+
 
 if __name__ == '__main__':
     unittest_main()
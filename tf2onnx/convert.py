@@ -8,7 +8,13 @@ python -m tf2onnx.convert : api and commandline tool to convert a tensorflow mod
 # pylint: disable=unused-argument,unused-import,ungrouped-imports,wrong-import-position
 
 import argparse
+import contextlib
+import functools
+import glob
+import hashlib
+import json
 import os
+import shutil
 import sys
 from packaging.version import Version
 
@@ -17,8 +23,8 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = "3"
 import tensorflow as tf
 
 from tf2onnx.tfonnx import process_tf_graph
-from tf2onnx import constants, logging, utils, optimizer
-from tf2onnx import tf_loader
+from tf2onnx import constants, logging, utils, optimizer, version
+from tf2onnx import tf_loader, tfjs_utils
 from tf2onnx.graph import ExternalTensorStorage
 from tf2onnx.tf_utils import compress_graph_def, get_tf_version
 
@@ -40,9 +46,21 @@ If you run into issues, open an issue here:
     https://github.com/onnx/tensorflow-onnx/issues
 """
 
+# commandline arguments that take a comma-separated list
+_CSV_ARGS = ("outputs", "ignore_default", "use_default", "rename_inputs", "rename_outputs",
+             "inputs_as_nchw", "outputs_as_nchw", "target", "load_op_libraries")
 
-def get_args():
-    """Parse commandline."""
+
+def _split_csv(value):
+    """Split a comma-separated commandline value into interned tokens, empty values are returned as is."""
+    if not value:
+        return value
+    return [sys.intern(t) for t in value.split(",")]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_parser():
+    """Build the commandline parser once; it is reused by every call to get_args()."""
     parser = argparse.ArgumentParser(description="Convert tensorflow graphs to ONNX.",
                                      formatter_class=argparse.RawDescriptionHelpFormatter, epilog=_HELP_TEXT)
     parser.add_argument("--input", help="input from graphdef")
@@ -83,11 +101,31 @@ def get_args():
     parser.add_argument("--verbose", "-v", help="verbose output, option is additive", action="count")
     parser.add_argument("--debug", help="debug mode", action="store_true")
     parser.add_argument("--output_frozen_graph", help="output frozen tf graph to file")
+    parser.add_argument("--grappler-full", help="(experimental) also run the pruning, arithmetic, remap and loop "
+                                                "grappler optimizers before converting", action="store_true")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="reuse the result of an earlier conversion of the unchanged model with the same "
+                             "arguments, cached in $XDG_CACHE_HOME/tf2onnx")
+    parser.add_argument("--server", action="store_true",
+                        help="keep running and convert the models requested on stdin, one json object per line "
+                             "with the commandline flags as keys, e.g. {\"saved-model\": \"dir\", \"output\": "
+                             "\"model.onnx\"}")
+    parser.add_argument("--pin-numa", action="store_true",
+                        help="on multi-socket linux hosts, run the conversion on the cpus of the first numa node")
+    parser.add_argument("--tf-threads", type=int, default=None,
+                        help="number of intra-op threads tensorflow uses while loading and folding the model "
+                             "(inter-op work is kept on one thread). Defaults to the tensorflow setting")
 
     # experimental
     parser.add_argument("--inputs-as-nchw", help="transpose inputs as from nhwc to nchw")
     parser.add_argument("--outputs-as-nchw", help="transpose outputs as from nhwc to nchw")
-    args = parser.parse_args()
+    return parser
+
+
+def get_args(argv=None):
+    """Parse commandline, argv defaults to sys.argv[1:]."""
+    parser = _get_parser()
+    args = parser.parse_args(argv)
 
     args.shape_override = None
     if args.input:
@@ -96,27 +134,14 @@ def get_args():
     if args.graphdef or args.checkpoint:
         if not args.inputs or not args.outputs:
             parser.error("graphdef and checkpoint models need to provide inputs and outputs")
-    if not any([args.graphdef, args.checkpoint, args.saved_model, args.keras, args.tflite, args.tfjs]):
+    if not args.server and not any([args.graphdef, args.checkpoint, args.saved_model, args.keras, args.tflite,
+                                    args.tfjs]):
         parser.print_help()
         sys.exit(1)
     if args.inputs:
         args.inputs, args.shape_override = utils.split_nodename_and_shape(args.inputs)
-    if args.outputs:
-        args.outputs = args.outputs.split(",")
-    if args.ignore_default:
-        args.ignore_default = args.ignore_default.split(",")
-    if args.use_default:
-        args.use_default = args.use_default.split(",")
-    if args.rename_outputs:
-        args.rename_outputs = args.rename_outputs.split(",")
-    if args.rename_inputs:
-        args.rename_inputs = args.rename_inputs.split(",")
-    if args.inputs_as_nchw:
-        args.inputs_as_nchw = args.inputs_as_nchw.split(",")
-    if args.outputs_as_nchw:
-        args.outputs_as_nchw = args.outputs_as_nchw.split(",")
-    if args.target:
-        args.target = args.target.split(",")
+    for attr in _CSV_ARGS:
+        setattr(args, attr, _split_csv(getattr(args, attr)))
     if args.signature_def:
         args.signature_def = [args.signature_def]
     if args.dequantize:
@@ -131,8 +156,6 @@ def get_args():
                 parser.error("invalid extra_opset argument")
             extra_opset_list.append(utils.make_opsetid(tokens[0], int(tokens[1])))
         args.extra_opset = extra_opset_list
-    if args.load_op_libraries:
-        args.load_op_libraries = args.load_op_libraries.split(",")
     return args
 
 
@@ -157,13 +180,15 @@ def _convert_common(frozen_graph, name="unknown", large_model=False, output_path
         custom_op_handlers.update(
             {op: (make_default_custom_op_handler(domain), []) for op, domain in custom_ops.items()})
 
-    with tf.Graph().as_default() as tf_graph:
+    # tflite and tfjs models are parsed directly, only a frozen tf graph needs a tf.Graph to import into
+    from_tf_graph = not kwargs.get("tflite_path") and not kwargs.get("tfjs_path")
+    with tf.Graph().as_default() if from_tf_graph else contextlib.nullcontext() as tf_graph:
         if large_model:
             const_node_values = compress_graph_def(frozen_graph)
             external_tensor_storage = ExternalTensorStorage()
         if output_frozen_graph:
             utils.save_protobuf(output_frozen_graph, frozen_graph)
-        if not kwargs.get("tflite_path") and not kwargs.get("tfjs_path"):
+        if from_tf_graph:
             tf.import_graph_def(frozen_graph, name='')
         g = process_tf_graph(tf_graph, const_node_values=const_node_values,
                              custom_op_handlers=custom_op_handlers, **kwargs)
@@ -183,14 +208,197 @@ def _convert_common(frozen_graph, name="unknown", large_model=False, output_path
     return model_proto, external_tensor_storage
 
 
+# args main() applies once to the whole process, a server request can't change them
+_SERVER_PROCESS_ARGS = ("server", "verbose", "debug", "tf_threads", "pin_numa")
+
+
+def _server_request_to_argv(request):
+    """
+    Turn a server request like {"saved-model": "model_dir", "large_model": true} into commandline arguments.
+    List values like {"outputs": ["a:0", "b:0"]} are joined into the comma-separated form.
+    """
+    argv = []
+    for flag, value in request.items():
+        if value is None or value is False:
+            continue
+        argv.append("--" + flag)
+        if isinstance(value, list):
+            argv.append(",".join(str(v) for v in value))
+        elif value is not True:
+            argv.append(str(value))
+    return argv
+
+
+def _check_server_request_args(args):
+    """Reject server requests that set args only main() applies."""
+    parser = _get_parser()
+    for dest in _SERVER_PROCESS_ARGS:
+        if getattr(args, dest) != parser.get_default(dest):
+            raise ValueError("--{} applies to the whole server and can't be set in a request, pass it on the "
+                             "commandline with --server instead".format(dest.replace("_", "-")))
+
+
+def serve(stdin=None, stdout=None):
+    """
+    Convert models requested on stdin, one json object per line with the same flags as the commandline.
+    A json status line is written to stdout for every request.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    logger = logging.getLogger(constants.TF2ONNX_PACKAGE_NAME)
+    for line in stdin:
+        if not line.strip():
+            continue
+        # stdout only carries the responses
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                args = get_args(_server_request_to_argv(json.loads(line)))
+                _check_server_request_args(args)
+                convert_one(args)
+                response = {"status": "ok", "output": args.output}
+            except SystemExit:
+                # argparse has already reported the problem
+                response = {"status": "error", "error": "invalid arguments"}
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Conversion request failed: %s", line.strip(), exc_info=1)
+                response = {"status": "error", "error": str(e)}
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+
+def _rename_map(names, new_names, kind):
+    """Map the model inputs or outputs to new names, checking up front that each gets exactly one unique name."""
+    flag = "--rename-" + kind
+    if names is None:
+        raise ValueError("%s requires the model %s, use --%s to provide them" % (flag, kind, kind))
+    if len(names) != len(new_names):
+        raise ValueError("%s has %d names but the model has %d %s" % (flag, len(new_names), len(names), kind))
+    if len(set(new_names)) != len(new_names):
+        raise ValueError("%s contains duplicate names: %s" % (flag, new_names))
+    return dict(zip(names, new_names))
+
+
+def _parse_cpulist(cpulist):
+    """Parse a linux cpu list like '0-3,8-11' into a set of cpu ids."""
+    cpus = set()
+    for part in cpulist.strip().split(","):
+        if part:
+            first, _, last = part.partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _pin_to_numa_node(node=0):
+    """
+    Restrict the process to the cpus of one numa node. Memory is allocated on the node of the cpu that first touches
+    it, so the large constant tensors stay local to the cpus scanning them.
+    """
+    logger = logging.getLogger(constants.TF2ONNX_PACKAGE_NAME)
+    node_dir = "/sys/devices/system/node"
+    num_nodes = len(glob.glob(os.path.join(node_dir, "node[0-9]*")))
+    if num_nodes < 2 or not hasattr(os, "sched_setaffinity"):
+        logger.info("Found %d numa nodes, --pin-numa is ignored", num_nodes)
+        return
+    with open(os.path.join(node_dir, "node{}".format(node), "cpulist")) as f:
+        cpus = _parse_cpulist(f.read()) & os.sched_getaffinity(0)
+    if not cpus:
+        logger.warning("None of the cpus of numa node %d are available, --pin-numa is ignored", node)
+        return
+    os.sched_setaffinity(0, cpus)
+    logger.info("Pinned conversion to the %d cpus of numa node %d", len(cpus), node)
+
+
 def main():
     args = get_args()
     logging.basicConfig(level=logging.get_verbosity_level(args.verbose))
     if args.debug:
         utils.set_debug_mode(True)
 
+    if args.pin_numa:
+        _pin_to_numa_node()
+
+    if args.tf_threads:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(args.tf_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            logging.getLogger(constants.TF2ONNX_PACKAGE_NAME).warning(
+                "tensorflow is already initialized, --tf-threads is ignored")
+
+    if args.server:
+        serve()
+    else:
+        convert_one(args)
+
+
+# args that don't change the converted model and are left out of the cache key
+_CACHE_IGNORED_ARGS = {"output", "verbose", "debug", "server", "use_cache", "tf_threads", "pin_numa"}
+
+
+def _cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, constants.TF2ONNX_PACKAGE_NAME)
+
+
+def _model_files(args, model_path):
+    """The files a conversion reads the model from, without the output and the cache."""
+    if os.path.isdir(model_path):
+        model_files = [os.path.join(root, f) for root, _, files in os.walk(model_path) for f in files]
+    elif args.checkpoint:
+        # the checkpoint path is the .meta file, the variables are in the .index and .data-* files next to it
+        prefix = model_path[:-len(".meta")]
+        model_files = [model_path, prefix + ".index"] + glob.glob(glob.escape(prefix) + ".data-*")
+    elif args.tfjs:
+        model, _ = tfjs_utils.read_model_json(model_path)
+        model_dir = os.path.dirname(model_path)
+        model_files = [model_path] + [os.path.join(model_dir, path)
+                                      for group in model.get("weightsManifest", []) for path in group["paths"]]
+    else:
+        model_files = [model_path]
+    excluded = {os.path.abspath(args.output)}
+    cache_dir = os.path.join(os.path.abspath(_cache_dir()), "")
+    return sorted(path for path in map(os.path.abspath, model_files)
+                  if path not in excluded and not path.startswith(cache_dir) and os.path.isfile(path))
+
+
+def _conversion_cache_path(args, model_path, model_files):
+    """
+    Path of the cached conversion for the model and args. The key covers the args, the tf2onnx, tensorflow and onnx
+    versions and the size and mtime of model_files, the files the model is read from.
+    """
+    key = hashlib.blake2b(digest_size=16)
+    cached_args = {k: v for k, v in vars(args).items() if k not in _CACHE_IGNORED_ARGS}
+    key.update(json.dumps(cached_args, sort_keys=True, default=str).encode())
+    key.update(json.dumps([version.version, version.git_version, tf.__version__, utils.get_onnx_version(),
+                           os.path.abspath(model_path)]).encode())
+    for path in model_files:
+        stat = os.stat(path)
+        key.update("{}:{}:{}".format(path, stat.st_size, stat.st_mtime_ns).encode())
+    return os.path.join(_cache_dir(), key.hexdigest() + ".onnx")
+
+
+def convert_one(args):
+    """Convert the model given by the parsed commandline args."""
     logger = logging.getLogger(constants.TF2ONNX_PACKAGE_NAME)
 
+    cache_path = None
+    if args.use_cache and args.output and not args.output_frozen_graph:
+        model_path = args.graphdef or args.checkpoint or args.saved_model or args.keras or args.tflite or args.tfjs
+        # remote models can change without us noticing, only local files are covered by the cache key
+        model_files = [] if "://" in model_path else _model_files(args, model_path)
+        if model_files:
+            cache_path = _conversion_cache_path(args, model_path, model_files)
+        else:
+            logger.info("%s is not a local model, --use-cache is ignored", model_path)
+        if cache_path and os.path.exists(cache_path):
+            dir_name = os.path.dirname(args.output)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            shutil.copyfile(cache_path, args.output)
+            logger.info("Reusing the cached conversion of %s from %s", model_path, cache_path)
+            logger.info("ONNX model is saved at %s", args.output)
+            return
+
     extra_opset = args.extra_opset or []
     tflite_path = None
     tfjs_path = None
@@ -198,19 +406,19 @@ def main():
     initialized_tables = None
     tensors_to_rename = {}
     if args.custom_ops:
-        using_tf_opset = False
-        for op in args.custom_ops.split(","):
-            if ":" in op:
-                op, domain = op.split(":")
-            else:
-                # default custom ops for tensorflow-onnx are in the "tf" namespace
-                using_tf_opset = True
-                domain = constants.TENSORFLOW_OPSET.domain
-            custom_op_handlers[op] = (make_default_custom_op_handler(domain), [])
-        if using_tf_opset:
-            extra_opset.append(constants.TENSORFLOW_OPSET)
-
-    if any(opset.domain == constants.CONTRIB_OPS_DOMAIN for opset in extra_opset):
+        custom_ops = _split_csv(args.custom_ops)
+        tf_opset = constants.TENSORFLOW_OPSET
+        # default custom ops for tensorflow-onnx are in the "tf" namespace
+        custom_op_domains = dict(op.split(":") if ":" in op else (op, tf_opset.domain) for op in custom_ops)
+        custom_op_handlers = {op: (make_default_custom_op_handler(domain), [])
+                              for op, domain in custom_op_domains.items()}
+        if any(":" not in op for op in custom_ops):
+            extra_opset.append(tf_opset)
+
+    contrib_domain = constants.CONTRIB_OPS_DOMAIN
+    # tensorflow_text registers its ops with tensorflow, which only matters for models loaded by tensorflow
+    loads_tf_model = not args.tflite and not args.tfjs
+    if loads_tf_model and any(opset.domain == contrib_domain for opset in extra_opset):
         try:
             import tensorflow_text   # pylint: disable=import-outside-toplevel
         except ModuleNotFoundError:
@@ -225,6 +433,9 @@ def main():
     if not utils.is_cpp_protobuf():
         logger.warning("***IMPORTANT*** Installed protobuf is not cpp accelerated. Conversion will be extremely slow. "
                        "See https://github.com/onnx/tensorflow-onnx/issues/1557")
+        if os.environ.get("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION") == "python":
+            logger.warning("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python selects the pure python protobuf parser. "
+                           "Unset it to use the accelerated implementation if it is installed.")
 
     if args.load_op_libraries:
         for op_filepath in args.load_op_libraries:
@@ -233,20 +444,22 @@ def main():
                 op_filepath = os.getcwd() + "/" + op_filepath
             tf.load_op_library(op_filepath)
     if args.graphdef:
-        graph_def, inputs, outputs = tf_loader.from_graphdef(args.graphdef, args.inputs, args.outputs)
+        graph_def, inputs, outputs = tf_loader.from_graphdef(args.graphdef, args.inputs, args.outputs,
+                                                             grappler_full=args.grappler_full)
         model_path = args.graphdef
     if args.checkpoint:
-        graph_def, inputs, outputs = tf_loader.from_checkpoint(args.checkpoint, args.inputs, args.outputs)
+        graph_def, inputs, outputs = tf_loader.from_checkpoint(args.checkpoint, args.inputs, args.outputs,
+                                                               grappler_full=args.grappler_full)
         model_path = args.checkpoint
     if args.saved_model:
         graph_def, inputs, outputs, initialized_tables, tensors_to_rename = tf_loader.from_saved_model(
             args.saved_model, args.inputs, args.outputs, args.tag, args.signature_def, args.concrete_function,
             args.large_model, return_initialized_tables=True, return_tensors_to_rename=True,
-            use_graph_names=args.use_graph_names)
+            use_graph_names=args.use_graph_names, grappler_full=args.grappler_full)
         model_path = args.saved_model
     if args.keras:
         graph_def, inputs, outputs = tf_loader.from_keras(
-            args.keras, args.inputs, args.outputs)
+            args.keras, args.inputs, args.outputs, grappler_full=args.grappler_full)
         model_path = args.keras
     if args.tflite:
         # Optional, but used to cut graph if provided.
@@ -265,9 +478,9 @@ def main():
         logger.info("outputs: %s", outputs)
 
     if args.rename_inputs:
-        tensors_to_rename.update(zip(inputs, args.rename_inputs))
+        tensors_to_rename.update(_rename_map(inputs, args.rename_inputs, "inputs"))
     if args.rename_outputs:
-        tensors_to_rename.update(zip(outputs, args.rename_outputs))
+        tensors_to_rename.update(_rename_map(outputs, args.rename_outputs, "outputs"))
 
     with tf.device("/cpu:0"):
         model_proto, _ = _convert_common(
@@ -294,6 +507,12 @@ def main():
             output_frozen_graph=args.output_frozen_graph,
             output_path=args.output)
 
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # copy under a temporary name first so concurrent conversions never see a partial file
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        shutil.copyfile(args.output, tmp_path)
+        os.replace(tmp_path, cache_path)
 
     # write onnx graph
     logger.info("")
@@ -76,7 +76,7 @@ def optimize_graph(graph, catch_errors=True, optimizers=None):
         logger.warning("Failed topological_sort", exc_info=1)
 
     after = graph.dump_node_statistics()
-    diff = copy.deepcopy(after)
+    diff = after.copy()
     diff.subtract(before)
     diff = ["{} {} ({}->{})".format(k, str(v) if v < 0 else '+' + str(v), before.get(k, 0), after.get(k, 0))
             for k, v in sorted(diff.items()) if v != 0]
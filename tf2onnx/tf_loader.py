@@ -206,7 +206,7 @@ def fix_freezing_errors_part2(graph_def):
     return graph_def
 
 
-def from_trackable(trackable, concrete_func, inputs, outputs, large_model):
+def from_trackable(trackable, concrete_func, inputs, outputs, large_model, grappler_full=False):
     err_large_model = "model exceeds maximum protobuf size of 2GB. Try setting large_model."
 
     # Avoid errors due to bug in TF freezing
@@ -214,7 +214,7 @@ def from_trackable(trackable, concrete_func, inputs, outputs, large_model):
         _remove_non_variable_resources_from_captures(concrete_func)
 
     try:
-        frozen_graph = from_function(concrete_func, inputs, outputs, large_model)
+        frozen_graph = from_function(concrete_func, inputs, outputs, large_model, grappler_full)
     except ValueError as e:
         if any(msg in str(e) for msg in ["exceeds maximum protobuf size of 2GB", "string too long"]):
             raise ValueError(err_large_model)
@@ -258,7 +258,7 @@ def from_trackable(trackable, concrete_func, inputs, outputs, large_model):
     return frozen_graph, initialized_tables
 
 
-def from_function(func, input_names, output_names, large_model=False):
+def from_function(func, input_names, output_names, large_model=False, grappler_full=False):
     if large_model:
         return convert_variables_to_constants_large_model(func)
 
@@ -283,7 +283,7 @@ def from_function(func, input_names, output_names, large_model=False):
         with tf_session(graph=tf_graph) as sess:
             tf.import_graph_def(graph_def, name='')
             input_names = inputs_without_resource(sess, input_names)
-            graph_def = tf_optimize(input_names, output_names, graph_def)
+            graph_def = tf_optimize(input_names, output_names, graph_def, grappler_full)
     return graph_def
 
 
@@ -330,29 +330,37 @@ def remove_redundant_inputs(frozen_graph, input_names):
     return frozen_inputs
 
 
-def from_graphdef(model_path, input_names, output_names):
+def _read_model_file(model_path):
+    """Read a model file in one go. Local files bypass gfile, which copies the content through its own buffer."""
+    if "://" in model_path:
+        with tf_gfile.GFile(model_path, 'rb') as f:
+            return f.read()
+    with open(model_path, 'rb') as f:
+        return f.read()
+
+
+def from_graphdef(model_path, input_names, output_names, grappler_full=False):
     """Load tensorflow graph from graphdef."""
     # make sure we start with clean default graph
     tf_reset_default_graph()
     with tf_session() as sess:
         graph_def = tf_graphdef()
-        with tf_gfile.GFile(model_path, 'rb') as f:
-            try:
-                content = f.read()
-            except Exception as e:
-                raise OSError(
-                    "Unable to load file '{}'.".format(model_path)) from e
-            try:
-                graph_def.ParseFromString(content)
-            except DecodeError:
-                content_as_bytes = compat.as_bytes(content)
-                saved_model = saved_model_pb2.SavedModel()
-                saved_model.ParseFromString(content_as_bytes)
-                graph_def = saved_model.meta_graphs[0].graph_def
-            except Exception as e:
-                raise RuntimeError(
-                    "Unable to parse file '{}'.".format(model_path)) from e
-            tf.import_graph_def(graph_def, name='')
+        try:
+            content = _read_model_file(model_path)
+        except Exception as e:
+            raise OSError(
+                "Unable to load file '{}'.".format(model_path)) from e
+        try:
+            graph_def.ParseFromString(content)
+        except DecodeError:
+            content_as_bytes = compat.as_bytes(content)
+            saved_model = saved_model_pb2.SavedModel()
+            saved_model.ParseFromString(content_as_bytes)
+            graph_def = saved_model.meta_graphs[0].graph_def
+        except Exception as e:
+            raise RuntimeError(
+                "Unable to parse file '{}'.".format(model_path)) from e
+        tf.import_graph_def(graph_def, name='')
         input_names = inputs_without_resource(sess, input_names)
         frozen_graph = freeze_session(sess, input_names=input_names, output_names=output_names)
         input_names = remove_redundant_inputs(frozen_graph, input_names)
@@ -360,12 +368,12 @@ def from_graphdef(model_path, input_names, output_names):
     tf_reset_default_graph()
     with tf_session() as sess:
         input_names = inputs_without_resource(sess, input_names)
-        frozen_graph = tf_optimize(input_names, output_names, frozen_graph)
+        frozen_graph = tf_optimize(input_names, output_names, frozen_graph, grappler_full)
     tf_reset_default_graph()
     return frozen_graph, input_names, output_names
 
 
-def from_checkpoint(model_path, input_names, output_names):
+def from_checkpoint(model_path, input_names, output_names, grappler_full=False):
     """Load tensorflow graph from checkpoint."""
     # make sure we start with clean default graph
     tf_reset_default_graph()
@@ -381,7 +389,7 @@ def from_checkpoint(model_path, input_names, output_names):
 
         tf_reset_default_graph()
         with tf_session() as sess:
-            frozen_graph = tf_optimize(input_names, output_names, frozen_graph)
+            frozen_graph = tf_optimize(input_names, output_names, frozen_graph, grappler_full)
     tf_reset_default_graph()
     return frozen_graph, input_names, output_names
 
@@ -546,7 +554,7 @@ def _restore_captured_resources(concrete_func, graph_captures_copy, func_capture
 
 
 def _from_saved_model_v2(model_path, input_names, output_names, tag, signature_def,
-                         concrete_function_index, large_model, use_graph_names):
+                         concrete_function_index, large_model, use_graph_names, grappler_full=False):
     """Load tensorflow graph from saved_model."""
 
     wrn_no_tag = "'--tag' not specified for saved_model. Using --tag serve"
@@ -617,7 +625,8 @@ def _from_saved_model_v2(model_path, input_names, output_names, tag, signature_d
     else:
         outputs = output_names
 
-    frozen_graph, initialized_tables = from_trackable(imported, concrete_func, inputs, outputs, large_model)
+    frozen_graph, initialized_tables = \
+        from_trackable(imported, concrete_func, inputs, outputs, large_model, grappler_full)
 
     return frozen_graph, inputs, outputs, concrete_func, imported, initialized_tables, tensors_to_rename
 
@@ -625,7 +634,7 @@ def _from_saved_model_v2(model_path, input_names, output_names, tag, signature_d
 def from_saved_model(model_path, input_names, output_names, tag=None,
                      signatures=None, concrete_function=None, large_model=False,
                      return_concrete_func=False, return_initialized_tables=False,
-                     return_tensors_to_rename=False, use_graph_names=False):
+                     return_tensors_to_rename=False, use_graph_names=False, grappler_full=False):
     """Load tensorflow graph from saved_model."""
     if signatures is None:
         signatures = []
@@ -634,7 +643,7 @@ def from_saved_model(model_path, input_names, output_names, tag=None,
         if is_tf2():
             frozen_graph, input_names, output_names, concrete_func, imported, initialized_tables, tensors_to_rename = \
                 _from_saved_model_v2(model_path, input_names, output_names,
-                                     tag, signatures, concrete_function, large_model, use_graph_names)
+                                     tag, signatures, concrete_function, large_model, use_graph_names, grappler_full)
             result = [frozen_graph, input_names, output_names]
             if return_concrete_func:
                 result += [concrete_func, imported]
@@ -655,7 +664,7 @@ def from_saved_model(model_path, input_names, output_names, tag=None,
     return result
 
 
-def from_keras(model_path, input_names, output_names):
+def from_keras(model_path, input_names, output_names, grappler_full=False):
     """Load keras model - experimental for now."""
     from tensorflow import keras as _keras
     from tensorflow.python.keras.saving import saving_utils as _saving_utils
@@ -675,7 +684,7 @@ def from_keras(model_path, input_names, output_names):
                            if input_tensor.dtype != tf.dtypes.resource]
             output_names = [output_tensor.name for output_tensor in concrete_func.outputs
                             if output_tensor.dtype != tf.dtypes.resource]
-            frozen_graph = from_function(concrete_func, input_names, output_names)
+            frozen_graph = from_function(concrete_func, input_names, output_names, grappler_full=grappler_full)
         else:
             # Handles Keras when Eager mode is disabled.
             _keras.backend.clear_session()
@@ -689,12 +698,17 @@ def from_keras(model_path, input_names, output_names):
             frozen_graph = freeze_session(sess, input_names=input_names, output_names=output_names)
             tf_reset_default_graph()
             with tf_session() as sess:
-                frozen_graph = tf_optimize(input_names, output_names, frozen_graph)
+                frozen_graph = tf_optimize(input_names, output_names, frozen_graph, grappler_full)
             tf_reset_default_graph()
     return frozen_graph, input_names, output_names
 
 
-def tf_optimize_grappler(input_names, output_names, graph_def):
+# grappler optimizers used with --grappler-full. They shrink the graph before conversion but can rewrite patterns
+# the tf2onnx rewriters look for (e.g. pruning removes identities the tf-1.x lstm rewriter depends on).
+_GRAPPLER_FULL_OPTIMIZERS = ['pruning', 'constfold', 'arithmetic', 'dependency', 'function', 'remap', 'loop']
+
+
+def tf_optimize_grappler(input_names, output_names, graph_def, grappler_full=False):
     from tensorflow.core.protobuf import meta_graph_pb2 as meta_graph_pb2, config_pb2, rewriter_config_pb2
     from tensorflow.python.grappler import tf_optimizer as tf_opt
 
@@ -708,7 +722,9 @@ def tf_optimize_grappler(input_names, output_names, graph_def):
         'constfold', 'function'
     ]
 
-    if is_tf2():
+    if grappler_full:
+        rewrite_options.optimizers[:] = _GRAPPLER_FULL_OPTIMIZERS
+    elif is_tf2():
         # add for tf2.x lstm optimization.
         rewrite_options.optimizers.append('dependency')
 
@@ -725,14 +741,14 @@ def tf_optimize_grappler(input_names, output_names, graph_def):
     return graph_def
 
 
-def tf_optimize(input_names, output_names, graph_def):
+def tf_optimize(input_names, output_names, graph_def, grappler_full=False):
     """Extract inference subgraph and optimize graph."""
     assert isinstance(input_names, list)
     assert isinstance(output_names, list)
 
     want_grappler = is_tf2() or Version(tf.__version__) >= Version("1.15")
     if want_grappler:
-        graph_def = tf_optimize_grappler(input_names, output_names, graph_def)
+        graph_def = tf_optimize_grappler(input_names, output_names, graph_def, grappler_full)
     else:
         # the older transform path
         from tensorflow.tools.graph_transforms import TransformGraph  # pylint: disable=redefined-outer-name
@@ -128,16 +128,15 @@ def compress_graph_def(graph_def):
     """
     Remove large const values from graph. This lets us import the graph and run shape inference without TF crashing.
     """
-    node_defs = list(graph_def.node)
+    # Small constants are sometimes used to store shape information and must be maintained
+    large_consts = [node_def for node_def in graph_def.node
+                    if node_def.op == 'Const' and len(node_def.attr["value"].tensor.tensor_content) > 1000]
     const_node_values = {}
-    for node_def in node_defs:
-        if node_def.op == 'Const':
-            tensor = node_def.attr["value"].tensor
-            # Small constants are sometimes used to store shape information and must be maintained
-            if len(tensor.tensor_content) > 1000:
-                make_sure(node_def.name not in const_node_values, "Two nodes in graph have same name %s", node_def.name)
-                const_node_values[node_def.name] = tensor.tensor_content
-                tensor.tensor_content = b''
+    for node_def in large_consts:
+        make_sure(node_def.name not in const_node_values, "Two nodes in graph have same name %s", node_def.name)
+        tensor = node_def.attr["value"].tensor
+        const_node_values[node_def.name] = tensor.tensor_content
+        tensor.tensor_content = b''
     return const_node_values
 
 def get_index_from_strided_slice_of_shape(node, outputs_to_values):
@@ -166,6 +165,35 @@ def get_index_from_strided_slice_of_shape(node, outputs_to_values):
         return None
     return i1
 
+# ops whose numpy equivalent gives the same result as tensorflow, for the dtypes in _NUMPY_FOLD_DTYPES
+_NUMPY_FOLD_FUNCS = {
+    "Identity": lambda x: x,
+    "Reshape": np.reshape,
+    "Add": np.add,
+    "AddV2": np.add,
+    "Sub": np.subtract,
+    "Mul": np.multiply,
+}
+
+_NUMPY_FOLD_DTYPES = [np.float32, np.float64, np.int8, np.int16, np.int32, np.int64,
+                      np.uint8, np.uint16, np.uint32, np.uint64]
+
+
+def compute_const_folding_using_numpy(op_type, inputs):
+    """Compute the output of a simple op with constant inputs without running a tf session, returns None if
+    the op can't be computed this way"""
+    func = _NUMPY_FOLD_FUNCS.get(op_type)
+    if func is None or inputs[0].dtype not in _NUMPY_FOLD_DTYPES:
+        return None
+    if op_type != "Reshape" and any(inp.dtype != inputs[0].dtype for inp in inputs):
+        return None
+    try:
+        return [np.asarray(func(*inputs), dtype=inputs[0].dtype)]
+    except ValueError:
+        # let tensorflow handle (and report) shapes numpy can't process
+        return None
+
+
 def compute_const_folding_using_tf(g, const_node_values, graph_outputs):
     """Find nodes with constant inputs and compute their values using TF"""
     if const_node_values is None:
@@ -185,6 +213,20 @@ def compute_const_folding_using_tf(g, const_node_values, graph_outputs):
     def is_huge_shape(x):
         return np.product(x) >= 1000000
 
+    def run_node_using_tf(node, input_names, output_names, inp_values):
+        # Make a mini graph containing just the node to fold
+        g2 = tf.Graph()
+        with g2.as_default():
+            for inp in input_names:
+                tf_placeholder(outputs_to_dtypes[inp], name=inp.split(':')[0])
+            mini_graph_def = g2.as_graph_def()
+            mini_graph_def.node.append(node.node_def)
+        g3 = tf.Graph()
+        with g3.as_default():
+            with tf_session() as sess:
+                tf.import_graph_def(mini_graph_def, name='')
+                return sess.run(output_names, feed_dict=dict(zip(input_names, inp_values)))
+
     for node in ops:
         # Load values of constants. Use const_node_values if possible
         if node.type in ["Const", "ConstV2"]:
@@ -230,34 +272,21 @@ def compute_const_folding_using_tf(g, const_node_values, graph_outputs):
             # Skip if value already computed, used, and discarded
             can_fold = can_fold and output_names[0] not in unneeded_outputs and output_names[0] not in graph_outputs
             if can_fold:
-                # Make a mini graph containing just the node to fold
-                g2 = tf.Graph()
-                with g2.as_default():
-                    for inp in input_names:
-                        tf_placeholder(outputs_to_dtypes[inp], name=inp.split(':')[0])
-                    mini_graph_def = g2.as_graph_def()
-                    mini_graph_def.node.append(node.node_def)
-                g3 = tf.Graph()
-                with g3.as_default():
-                    feed_dict = {}
-                    inp_shapes = []
-                    for inp in input_names:
-                        inp_np = outputs_to_values[inp]
-                        feed_dict[inp] = inp_np
-                        inp_shapes.append(inp_np.shape)
-                    try:
-                        with tf_session() as sess:
-                            tf.import_graph_def(mini_graph_def, name='')
-                            results = sess.run(output_names, feed_dict=feed_dict)
-                        if is_huge_shape(results[0].shape) and all(is_small_shape(inp) for inp in inp_shapes):
-                            logger.debug("Skipping folding of node %s since result shape %s is much larger "
-                                         "than input shapes %s", node.name, results[0].shape, inp_shapes)
-                        else:
-                            outputs_to_values[output_names[0]] = results[0]
-                            outputs_to_dtypes[output_names[0]] = node.outputs[0].dtype
-                            progress = True
-                    except Exception:  # pylint: disable=broad-except
-                        logger.debug("Could not fold node %s", node.name)
+                inp_values = [outputs_to_values[inp] for inp in input_names]
+                inp_shapes = [inp_np.shape for inp_np in inp_values]
+                try:
+                    results = compute_const_folding_using_numpy(node.type, inp_values)
+                    if results is None:
+                        results = run_node_using_tf(node, input_names, output_names, inp_values)
+                    if is_huge_shape(results[0].shape) and all(is_small_shape(inp) for inp in inp_shapes):
+                        logger.debug("Skipping folding of node %s since result shape %s is much larger "
+                                     "than input shapes %s", node.name, results[0].shape, inp_shapes)
+                    else:
+                        outputs_to_values[output_names[0]] = results[0]
+                        outputs_to_dtypes[output_names[0]] = node.outputs[0].dtype
+                        progress = True
+                except Exception:  # pylint: disable=broad-except
+                    logger.debug("Could not fold node %s", node.name)
         unneeded_outputs.update(outputs_to_values.keys())
         for node in ops:
             # Mark values we need to keep
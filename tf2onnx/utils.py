@@ -21,6 +21,7 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import numpy as np
 from google.protobuf import text_format
+from google.protobuf.descriptor import FieldDescriptor
 from onnx import helper, onnx_pb, defs, numpy_helper, AttributeProto, ModelProto, NodeProto, __version__
 from . import constants
 
@@ -415,13 +416,72 @@ def delete_directory(path):
         shutil.rmtree(path)
 
 
+# models larger than this are written one initializer at a time by save_protobuf
+SAVE_PROTOBUF_CHUNKED_THRESHOLD = 512 * 1024 * 1024
+# protobuf can't parse messages larger than this, bigger models need large_model
+PROTOBUF_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+
+def _varint_bytes(value):
+    """Encode value as a protobuf varint, used for field tags and length prefixes."""
+    # google.protobuf.internal.encoder has this, but it is not part of the public protobuf api
+    data = bytearray()
+    while value > 0x7f:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _copy_fields(src, dst, skip_field):
+    """Copy all fields that are set in src, except skip_field, into dst."""
+    for field, value in src.ListFields():
+        if field.name == skip_field:
+            continue
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            getattr(dst, field.name).extend(value)
+        elif field.type == FieldDescriptor.TYPE_MESSAGE:
+            getattr(dst, field.name).CopyFrom(value)
+        else:
+            setattr(dst, field.name, value)
+
+
+def _save_model_proto_chunked(f, model_proto):
+    """
+    Write model_proto without serializing it into one buffer. The model without its initializers goes first,
+    then every initializer as a separate occurrence of the graph field which the parser merges back in order.
+    """
+    shell = ModelProto()
+    _copy_fields(model_proto, shell, "graph")
+    _copy_fields(model_proto.graph, shell.graph, "initializer")
+    f.write(shell.SerializeToString())
+    # a tag is the field number followed by the wire type, 2 for length delimited fields
+    graph_tag = _varint_bytes((ModelProto.GRAPH_FIELD_NUMBER << 3) | 2)
+    initializer_tag = _varint_bytes((onnx_pb.GraphProto.INITIALIZER_FIELD_NUMBER << 3) | 2)
+    for tensor in model_proto.graph.initializer:
+        data = tensor.SerializeToString()
+        header = initializer_tag + _varint_bytes(len(data))
+        f.write(graph_tag + _varint_bytes(len(header) + len(data)))
+        f.write(header)
+        f.write(data)
+
+
 def save_protobuf(path, message, as_text=False):
+    """
+    Save message to path. ModelProtos larger than SAVE_PROTOBUF_CHUNKED_THRESHOLD are written one initializer at a
+    time, ModelProtos over 2GB raise since protobuf can't read them back.
+    """
     dir_name = os.path.dirname(path)
     if dir_name:
         os.makedirs(dir_name, exist_ok=True)
     if as_text:
         with open(path, "w") as f:
             f.write(text_format.MessageToString(message))
+    elif isinstance(message, ModelProto) and message.ByteSize() > SAVE_PROTOBUF_CHUNKED_THRESHOLD:
+        if message.ByteSize() > PROTOBUF_MAX_SIZE:
+            raise ValueError("model exceeds maximum protobuf size of 2GB. Try setting large_model.")
+        with open(path, "wb", buffering=8 * 1024 * 1024) as f:
+            _save_model_proto_chunked(f, message)
     else:
         with open(path, "wb") as f:
             f.write(message.SerializeToString())